@@ -1,16 +1,58 @@
-from dataclasses import dataclass, asdict
-from datetime import datetime
+from dataclasses import dataclass, fields
+from datetime import date, time
+import atexit
+import bisect
 import csv
+import operator
 import os
+import re
+import sys
 
 CLIENTES_FILE = "clientes.csv"
 TURNOS_FILE = "turnos.csv"
-
+CAMBIOS_FILE = "cambios.log"
+BUFFER_SIZE = 1 << 20
+LOTE_CAMBIOS = 50
+FIN_CAMBIO = "."
+ESTADOS = ("ACTIVO", "CANCELADO")
+
+FECHA_RE = re.compile(r"(\d{1,2})/(\d{1,2})/(\d{4})")
+HORA_RE = re.compile(r"(\d{1,2}):(\d{1,2})")
+
+MENU = """==== Sistema de turnos para peluquería ====
+1) Registrar nuevo cliente
+2) Solicitar turno
+3) Listar turnos existentes
+4) Modificar o cancelar turno
+5) Guardar datos en CSV
+6) Salir"""
+
+def escapar(valor):
+    # Entrecomilla solo los campos que lo necesitan, como hace csv.writer.
+    if "," in valor or '"' in valor or "\n" in valor or "\r" in valor:
+        return '"' + valor.replace('"', '""') + '"'
+    return valor
+
+def escribir_csv(archivo, encabezado, filas):
+    # Escribe en un temporal y lo renombra: un corte nunca deja el CSV a medias.
+    tmp = archivo + ".tmp"
+    with open(tmp, "w", newline="", encoding="utf-8", buffering=BUFFER_SIZE) as f:
+        f.write(encabezado)
+        f.write("\n")
+        if filas:
+            f.write("\n".join(filas))
+            f.write("\n")
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(tmp, archivo)
+
+@dataclass(slots=True)
 class Cliente:
     dni: str
     nombre: str
     telefono: str
 
+@dataclass(slots=True)
 class Turno:
     id_turno: int
     dni_cliente: str
@@ -19,86 +61,175 @@ class Turno:
     servicio: str
     estado: str = "ACTIVO"  
 
+CLIENTE_CAMPOS = tuple(f.name for f in fields(Cliente))
+TURNO_CAMPOS = tuple(f.name for f in fields(Turno))
+CLIENTE_ENCABEZADO = ",".join(CLIENTE_CAMPOS)
+TURNO_ENCABEZADO = ",".join(TURNO_CAMPOS)
+CLIENTE_VALORES = operator.attrgetter(*CLIENTE_CAMPOS)
+TURNO_VALORES = operator.attrgetter(*TURNO_CAMPOS)
+
 class Peluqueria:
     def __init__(self): 
         self.clientes: dict[str, Cliente] = {}
         self.turnos: dict[int, Turno] = {}
         self.next_id = 1
+        self.ocupados: dict[tuple[str, str], int] = {}
+        self.turnos_por_dni: dict[str, list[int]] = {}
+        self.turnos_por_fecha: dict[str, list[tuple[str, int]]] = {}
+        self.cambios_pendientes = 0
+        self.log_cambios = None
+        self.log_writer = None
         self.cargar_datos()
+        atexit.register(self.guardar_si_hay_cambios)
+        self.menu = {
+            "1": self.registrar_cliente,
+            "2": self.solicitar_turno,
+            "3": self.listar_turnos,
+            "4": self.modificar_o_cancelar_turno,
+            "5": self.guardar_desde_menu,
+        }
 
     def cargar_datos(self):
         if os.path.exists(CLIENTES_FILE):
-            with open(CLIENTES_FILE, newline="", encoding="utf-8") as f:
-                reader = csv.DictReader(f)
-                for row in reader:
-                    cliente = Cliente(
-                        dni=row["dni"],
-                        nombre=row["nombre"],
-                        telefono=row["telefono"],
-                    )
-                    self.clientes[cliente.dni] = cliente
+            with open(CLIENTES_FILE, newline="", encoding="utf-8", buffering=BUFFER_SIZE) as f:
+                reader = csv.reader(f)
+                next(reader, None)
+                self.clientes = {r[0]: Cliente(r[0], r[1], r[2]) for r in reader if r}
 
         if os.path.exists(TURNOS_FILE):
-            with open(TURNOS_FILE, newline="", encoding="utf-8") as f:
-                reader = csv.DictReader(f)
-                max_id = 0
-                for row in reader:
-                    turno = Turno(
-                        id_turno=int(row["id_turno"]),
-                        dni_cliente=row["dni_cliente"],
-                        fecha=row["fecha"],
-                        hora=row["hora"],
-                        servicio=row["servicio"],
-                        estado=row.get("estado", "ACTIVO"),
-                    )
-                    self.turnos[turno.id_turno] = turno
-                    if turno.id_turno > max_id:
-                        max_id = turno.id_turno
-                    self.next_id = max_id + 1
+            with open(TURNOS_FILE, newline="", encoding="utf-8", buffering=BUFFER_SIZE) as f:
+                reader = csv.reader(f)
+                next(reader, None)
+                turnos = [
+                    Turno(int(r[0]), r[1], r[2], r[3], r[4], r[5] if len(r) > 5 else "ACTIVO")
+                    for r in reader
+                    if r
+                ]
+            self.turnos = {t.id_turno: t for t in turnos}
+            for t in self.turnos.values():
+                self.turnos_por_dni.setdefault(t.dni_cliente, []).append(t.id_turno)
+                self.turnos_por_fecha.setdefault(t.fecha, []).append((t.hora, t.id_turno))
+                if t.estado == "ACTIVO":
+                    self.ocupados[(t.fecha, t.hora)] = t.id_turno
+            for bucket in self.turnos_por_fecha.values():
+                bucket.sort()
+            self.next_id = max(self.turnos, default=0) + 1
+
+        self.cargar_cambios()
+
+    def cargar_cambios(self):
+        # Reaplica los cambios registrados después del último guardado.
+        if not os.path.exists(CAMBIOS_FILE):
+            return
+        with open(CAMBIOS_FILE, newline="", encoding="utf-8", buffering=BUFFER_SIZE) as f:
+            for row in csv.reader(f):
+                # Cada fila termina en FIN_CAMBIO: si falta, la escritura se cortó
+                # (p. ej. por un apagón) y la fila se descarta sin frenar el arranque.
+                if not row or row[-1] != FIN_CAMBIO:
+                    continue
+                if row[0] == "C" and len(row) == 5:
+                    self.clientes[row[1]] = Cliente(row[1], row[2], row[3])
+                elif row[0] == "T" and len(row) == 8 and row[6] in ESTADOS:
+                    try:
+                        id_turno = int(row[1])
+                    except ValueError:
+                        continue
+                    turno = Turno(id_turno, row[2], row[3], row[4], row[5], row[6])
+                    anterior = self.turnos.get(turno.id_turno)
+                    if anterior:
+                        self.desindexar_turno(anterior)
+                        self.turnos[turno.id_turno] = turno
+                        self.indexar_turno(turno)
+                    else:
+                        self.agregar_turno(turno)
+                        self.next_id = max(self.next_id, turno.id_turno + 1)
+                else:
+                    continue
+                self.cambios_pendientes += 1
+
+    def agregar_turno(self, turno):
+        self.turnos[turno.id_turno] = turno
+        self.turnos_por_dni.setdefault(turno.dni_cliente, []).append(turno.id_turno)
+        self.indexar_turno(turno)
+
+    def indexar_turno(self, turno):
+        bisect.insort(self.turnos_por_fecha.setdefault(turno.fecha, []), (turno.hora, turno.id_turno))
+        if turno.estado == "ACTIVO":
+            self.ocupados[(turno.fecha, turno.hora)] = turno.id_turno
+
+    def desindexar_turno(self, turno):
+        self.turnos_por_fecha[turno.fecha].remove((turno.hora, turno.id_turno))
+        clave = (turno.fecha, turno.hora)
+        if turno.estado == "ACTIVO" and self.ocupados.get(clave) == turno.id_turno:
+            del self.ocupados[clave]
+
+    def registrar_cambio(self, fila):
+        # Cada cambio se agrega al log sin fsync; los CSV se reescriben por lotes.
+        if self.log_cambios is None:
+            self.log_cambios = open(CAMBIOS_FILE, "a", newline="", encoding="utf-8")
+            self.log_writer = csv.writer(self.log_cambios)
+        self.log_writer.writerow((*fila, FIN_CAMBIO))
+        self.log_cambios.flush()
+        self.cambios_pendientes += 1
+        if self.cambios_pendientes >= LOTE_CAMBIOS:
+            self.guardar_datos()
+
+    def registrar_cambio_turno(self, turno):
+        self.registrar_cambio(("T", *TURNO_VALORES(turno)))
+
+    def guardar_si_hay_cambios(self):
+        if self.cambios_pendientes:
+            self.guardar_datos()
 
     def guardar_datos(self):
-        with open(CLIENTES_FILE, "w", newline="", encoding="utf-8") as f:
-            fieldnames = ["dni", "nombre", "telefono"]
-            writer = csv.DictWriter(f, fieldnames=fieldnames)
-            writer.writeheader()
-            for cliente in self.clientes.values():
-                writer.writerow(asdict(cliente))
-
-        with open(TURNOS_FILE, "w", newline="", encoding="utf-8") as f:
-            fieldnames = ["id_turno", "dni_cliente", "fecha", "hora", "servicio", "estado"]
-            writer = csv.DictWriter(f, fieldnames=fieldnames)
-            writer.writeheader()
-            for turno in self.turnos.values():
-                writer.writerow(asdict(turno))
-
+        self.guardar_clientes()
+        self.guardar_turnos()
+        if self.log_cambios is not None:
+            self.log_cambios.close()
+            self.log_cambios = None
+            self.log_writer = None
+        if os.path.exists(CAMBIOS_FILE):
+            os.remove(CAMBIOS_FILE)
+        self.cambios_pendientes = 0
+
+    def guardar_clientes(self):
+        filas = [",".join(map(escapar, CLIENTE_VALORES(c))) for c in self.clientes.values()]
+        escribir_csv(CLIENTES_FILE, CLIENTE_ENCABEZADO, filas)
+
+    def guardar_turnos(self):
+        # fecha, hora y estado los genera el sistema y nunca llevan comas.
+        filas = [
+            ",".join((str(id_turno), escapar(dni), fecha, hora, escapar(servicio), estado))
+            for id_turno, dni, fecha, hora, servicio, estado in map(TURNO_VALORES, self.turnos.values())
+        ]
+        escribir_csv(TURNOS_FILE, TURNO_ENCABEZADO, filas)
+
+    @staticmethod
     def pedir_fecha():
         while True:
             fecha_str = input("Ingrese la fecha (DD/MM/AAAA): ")
+            m = FECHA_RE.fullmatch(fecha_str)
             try:
-                fecha = datetime.strptime(fecha_str, "%d/%m/%Y").date()
-                return fecha
+                if m:
+                    return date(int(m[3]), int(m[2]), int(m[1]))
             except ValueError:
-                print("Fecha inválida. Intente nuevamente.")
+                pass
+            print("Fecha inválida. Intente nuevamente.")
 
-   
+    @staticmethod
     def pedir_hora():
         while True:
             hora_str = input("Ingrese la hora (HH:MM, formato 24hs): ")
+            m = HORA_RE.fullmatch(hora_str)
             try:
-                hora = datetime.strptime(hora_str, "%H:%M").time()
-                return hora
+                if m:
+                    return time(int(m[1]), int(m[2]))
             except ValueError:
-                print("Hora inválida. Intente nuevamente.")
-
-    def turno_ocupado(self, fecha, hora):
-        for turno in self.turnos.values():
-            if (
-                turno.estado == "ACTIVO"
-                and turno.fecha == fecha.isoformat()
-                and turno.hora == hora.strftime("%H:%M")
-            )
-                return True
-        return False
+                pass
+            print("Hora inválida. Intente nuevamente.")
+
+    def turno_ocupado(self, fecha_iso, hora_fmt):
+        return (fecha_iso, hora_fmt) in self.ocupados
 
     def registrar_cliente(self):
         print("\n--- Registrar nuevo cliente ---")
@@ -111,7 +242,7 @@ class Peluqueria:
 
         cliente = Cliente(dni=dni, nombre=nombre, telefono=telefono)
         self.clientes[dni] = cliente
-        self.guardar_datos()
+        self.registrar_cambio(("C", *CLIENTE_VALORES(cliente)))
         print("Cliente registrado con éxito.\n")
 
     def solicitar_turno(self):
@@ -125,10 +256,10 @@ class Peluqueria:
             print("No existe un cliente con ese DNI.")
             return
 
-        fecha = self.pedir_fecha()
-        hora = self.pedir_hora()
+        fecha_iso = self.pedir_fecha().isoformat()
+        hora_fmt = self.pedir_hora().strftime("%H:%M")
 
-        if self.turno_ocupado(fecha, hora):
+        if self.turno_ocupado(fecha_iso, hora_fmt):
             print("Ya existe un turno activo en esa fecha y hora.")
             return
 
@@ -136,13 +267,13 @@ class Peluqueria:
         turno = Turno(
             id_turno=self.next_id,
             dni_cliente=dni,
-            fecha=fecha.isoformat(),
-            hora=hora.strftime("%H:%M"),
+            fecha=fecha_iso,
+            hora=hora_fmt,
             servicio=servicio,
         )
-        self.turnos[turno.id_turno] = turno
+        self.agregar_turno(turno)
         self.next_id += 1
-        self.guardar_datos()
+        self.registrar_cambio_turno(turno)
         print(f"Turno registrado con ID {turno.id_turno}.\n")
 
     def listar_turnos(self):
@@ -156,28 +287,34 @@ class Peluqueria:
         print("3) Filtrar por fecha")
         opcion = input("Seleccione una opción: ").strip()
 
-        turnos_a_mostrar = list(self.turnos.values())
-
         if opcion == "2":
             dni = input("DNI: ").strip()
-            turnos_a_mostrar = [t for t in turnos_a_mostrar if t.dni_cliente == dni]
+            ids = self.turnos_por_dni.get(dni, [])
+            turnos_a_mostrar = [self.turnos[i] for i in ids]
         elif opcion == "3":
             fecha = self.pedir_fecha().isoformat()
-            turnos_a_mostrar = [t for t in turnos_a_mostrar if t.fecha == fecha]
+            # El índice por fecha ya está ordenado por hora.
+            turnos_a_mostrar = [self.turnos[i] for _, i in self.turnos_por_fecha.get(fecha, ())]
+        else:
+            turnos_a_mostrar = list(self.turnos.values())
 
         if not turnos_a_mostrar:
             print("No se encontraron turnos con ese criterio.\n")
             return
+
+        if opcion != "3":
             turnos_a_mostrar.sort(key=lambda t: (t.fecha, t.hora))
 
+        lineas = []
         for t in turnos_a_mostrar:
             cliente = self.clientes.get(t.dni_cliente)
             nombre = cliente.nombre if cliente else "Desconocido"
-            print(
+            lineas.append(
                 f"ID: {t.id_turno} | Cliente: {nombre} ({t.dni_cliente}) | "
                 f"Fecha: {t.fecha} {t.hora} | Servicio: {t.servicio} | Estado: {t.estado}"
             )
-        print()
+        sys.stdout.write("\n".join(lineas))
+        sys.stdout.write("\n\n")
 
     def modificar_o_cancelar_turno(self):
         print("\n--- Modificar o cancelar turno ---")
@@ -206,50 +343,45 @@ class Peluqueria:
         opcion = input("Opción: ").strip()
 
         if opcion == "1":
-            fecha = self.pedir_fecha()
-            hora = self.pedir_hora()
-            if self.turno_ocupado(fecha, hora):
+            fecha_iso = self.pedir_fecha().isoformat()
+            hora_fmt = self.pedir_hora().strftime("%H:%M")
+            if self.turno_ocupado(fecha_iso, hora_fmt):
                 print("Ya existe un turno activo en esa fecha y hora.")
                 return
-            turno.fecha = fecha.isoformat()
-            turno.hora = hora.strftime("%H:%M")
+            self.desindexar_turno(turno)
+            turno.fecha = fecha_iso
+            turno.hora = hora_fmt
+            self.indexar_turno(turno)
         elif opcion == "2":
             turno.servicio = input("Nuevo servicio: ").strip()
         elif opcion == "3":
+            self.desindexar_turno(turno)
             turno.estado = "CANCELADO"
+            self.indexar_turno(turno)
         else:
             print("Opción no válida.")
             return
 
-        self.guardar_datos()
+        self.registrar_cambio_turno(turno)
         print("Turno actualizado.\n")
 
     
+    def guardar_desde_menu(self):
+        self.guardar_datos()
+        print("Datos guardados en CSV.\n")
+
     def ejecutar(self):
         while True:
-            print("==== Sistema de turnos para peluquería ====")
-            print("1) Registrar nuevo cliente")
-            print("2) Solicitar turno")
-            print("3) Listar turnos existentes")
-            print("4) Modificar o cancelar turno")
-            print("5) Guardar datos en CSV")
-            print("6) Salir")
+            print(MENU)
             opcion = input("Seleccione una opción: ").strip()
 
-            if opcion == "1":
-                self.registrar_cliente()
-            elif opcion == "2":
-                self.solicitar_turno()
-            elif opcion == "3":
-                self.listar_turnos()
-            elif opcion == "4":
-                self.modificar_o_cancelar_turno()
-            elif opcion == "5":
-                self.guardar_datos()
-                print("Datos guardados en CSV.\n")
-            elif opcion == "6":
+            if opcion == "6":
+                self.guardar_si_hay_cambios()
                 print("Saliendo del sistema...")
                 break
+            accion = self.menu.get(opcion)
+            if accion:
+                accion()
             else:
                 print("Opción no válida.\n")
 